@@ -3,18 +3,28 @@ from graph_utils import initialize_resources, query_graph
 from chat_utils import initialize_chat_history, display_chat_history, handle_user_input
 st.title("International Football Knowledge Graph")
 with st.sidebar:
-    openai_api_key = st.text_input("Enter your OpenAI API Key", type="password")
+    with st.form("api_key_form"):
+        openai_api_key = st.text_input("Enter your OpenAI API Key", type="password")
+        debug = st.checkbox("Show intermediate steps")
+        submitted = st.form_submit_button("Apply")
     st.warning("Please enter your OpenAI API Key to use the chatbot.")
 
+# Only the applied settings live in session state; the cached resources are looked up on
+# every rerun so a cleared cache hands back rebuilt ones instead of closed ones
+if submitted:
+    st.session_state.api_key = openai_api_key
+    st.session_state.debug = debug
+api_key = st.session_state.get("api_key", "")
 graph, chain = None, None
-if openai_api_key:
+if api_key:
     with st.spinner("Initializing resources..."):
-        graph, chain = initialize_resources(openai_api_key)
+        graph, chain = initialize_resources(api_key, st.session_state.debug)
+    if submitted:
         st.success("Resources initialized successfully.")
 
 # Initialize and show chat UI regardless, so the input box is visible
 initialize_chat_history()
 display_chat_history()
 # Handle user input (function already checks for API key)
-handle_user_input(openai_api_key, query_graph, chain)
+handle_user_input(api_key, query_graph, chain)
     
\ No newline at end of file
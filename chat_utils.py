@@ -1,5 +1,8 @@
+import time
 import streamlit as st
 
+HISTORY_WINDOW = 20
+
 def initialize_chat_history():
     if "messages" not in st.session_state:
         st.session_state.messages = [
@@ -7,25 +10,58 @@ def initialize_chat_history():
             }
         ]
 
-def display_chat_history():
-    for message in st.session_state.messages:
+def _display_messages(messages):
+    for message in messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
+
+def display_chat_history():
+    messages = st.session_state.messages
+    head, tail = messages[:-HISTORY_WINDOW], messages[-HISTORY_WINDOW:]
+    if head:
+        with st.expander(f"Earlier ({len(head)} messages)", expanded=False):
+            _display_messages(head)
+    _display_messages(tail)
             
+def _safe_stream(stream):
+    try:
+        yield from stream
+    except Exception as e:
+        st.error(f"Error: {e}")
+        yield f"Sorry, I encountered an error: {e}"
+
+def _coalesce(gen, min_interval=0.05, min_chars=8):
+    buf = ""
+    last = time.monotonic()
+    for chunk in gen:
+        buf += chunk
+        if len(buf) >= min_chars and time.monotonic() - last >= min_interval:
+            yield buf
+            buf = ""
+            last = time.monotonic()
+    if buf:
+        yield buf
+
 def handle_user_input(openai_api_key: str, query_graph_func, chain):
     if prompt := st.chat_input("Enter your question about international football from 1872 to present:"):
         st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.markdown(prompt)
         if openai_api_key:
-            with st.spinner("Thinking..."):
-                try:
-                    response = query_graph_func(chain, prompt)
-                except Exception as e:
-                    st.error(f"Error: {e}")
-                    response = f"Sorry, I encountered an error: {e}"
             with st.chat_message("assistant"):
-                st.markdown(response)
+                placeholder = st.empty()
+                steps = []
+                stream = _coalesce(_safe_stream(query_graph_func(chain, prompt, steps)))
+                with st.spinner("Thinking..."):
+                    response = next(stream, "")
+                placeholder.code(response, language=None)
+                for chunk in stream:
+                    response += chunk
+                    placeholder.code(response, language=None)
+                placeholder.markdown(response)
+                if steps:
+                    with st.expander("Intermediate steps", expanded=False):
+                        st.json(steps)
             st.session_state.messages.append({"role": "assistant", "content": response})
         else:
             st.error("Please set your OpenAI API key in the sidebar.")
\ No newline at end of file
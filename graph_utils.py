@@ -1,23 +1,206 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+import httpx
 import streamlit as st
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_community.chains.graph_qa.cypher import GraphCypherQAChain
 from langchain_community.graphs import Neo4jGraph
 from langchain_openai import ChatOpenAI
 
-@st.cache_resource(show_spinner=False)
-def initialize_resources(api_key: str):
-    graph = Neo4jGraph(url=st.secrets["NEO4J_URI"], 
-    username=st.secrets["NEO4J_USER"], 
-    password=st.secrets["NEO4J_PASSWORD"],
+MODEL = "gpt-4o-mini"
+SCHEMA_CACHE_DIR = Path("schema_cache")
+SCHEMA_CACHE_TTL = 24 * 60 * 60
+KEEPALIVE_INTERVAL = 60
+ANSWER_CACHE_SIZE = 256
+ANSWER_CACHE_TTL = 60 * 60
+
+# Bound once at import; Neo4jGraph falls back to the NEO4J_* env vars when these are None.
+try:
+    _NEO4J_URI = st.secrets["NEO4J_URI"]
+    _NEO4J_USER = st.secrets["NEO4J_USER"]
+    _NEO4J_PASSWORD = st.secrets["NEO4J_PASSWORD"]
+except Exception:
+    _NEO4J_URI = _NEO4J_USER = _NEO4J_PASSWORD = None
+
+_keepalive_stops = weakref.WeakKeyDictionary()
+
+def _schema_cache_path(uri: str) -> Path:
+    key = hashlib.sha1(f"{uri}:{os.getenv('SCHEMA_VERSION', '')}".encode()).hexdigest()
+    return SCHEMA_CACHE_DIR / f"{key}.json"
+
+def _load_schema(graph: Neo4jGraph, uri: str):
+    path = _schema_cache_path(uri)
+    try:
+        if time.time() - path.stat().st_mtime < SCHEMA_CACHE_TTL:
+            cached = json.loads(path.read_text())
+            graph.schema = cached["schema"]
+            graph.structured_schema = cached["structured_schema"]
+            return
+    except (OSError, ValueError, KeyError):
+        pass
+    graph.refresh_schema()
+    try:
+        SCHEMA_CACHE_DIR.mkdir(exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps({"schema": graph.schema, "structured_schema": graph.structured_schema}))
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+def _keepalive(graph_ref: weakref.ref, stop: threading.Event):
+    # Holds only a weak reference so a graph dropped from the cache can be collected
+    while not stop.wait(KEEPALIVE_INTERVAL):
+        graph = graph_ref()
+        if graph is None:
+            return
+        try:
+            graph.query("RETURN 1")
+        except Exception:
+            pass
+        del graph
+
+def _release_graph(graph: Neo4jGraph):
+    stop = _keepalive_stops.pop(graph, None)
+    if stop is not None:
+        stop.set()
+    graph._driver.close()
+
+@st.cache_resource(show_spinner=False, on_release=_release_graph)
+def _get_graph():
+    graph = Neo4jGraph(url=_NEO4J_URI, 
+    username=_NEO4J_USER, 
+    password=_NEO4J_PASSWORD,
     enhanced_schema=True,
+    refresh_schema=False,
+    driver_config={"max_connection_pool_size": 4, "connection_acquisition_timeout": 10},
     )
-    graph.refresh_schema()
-    chain = GraphCypherQAChain.from_llm(
-        llm=ChatOpenAI(api_key=api_key, model="gpt-4o-mini", temperature=0),
-        graph=graph,
-        verbose=True,
+    _load_schema(graph, _NEO4J_URI or os.getenv("NEO4J_URI", ""))
+    stop = threading.Event()
+    _keepalive_stops[graph] = stop
+    threading.Thread(target=_keepalive, args=(weakref.ref(graph), stop), daemon=True).start()
+    return graph
+
+@st.cache_resource(show_spinner=False)
+def _schema_fingerprint() -> str:
+    schema = _get_graph().get_structured_schema
+    return hashlib.sha1(json.dumps(schema, sort_keys=True).encode()).hexdigest()[:12]
+
+# The answer is only known once streaming ends and st.cache_data cannot be filled from outside
+# the cached function, so the LRU is hand-rolled; holding it in st.cache_resource means
+# "Clear cache" resets it along with everything else.
+@st.cache_resource(show_spinner=False)
+def _answer_cache():
+    return OrderedDict(), threading.Lock()
+
+def _get_cached_answer(key: tuple):
+    cache, lock = _answer_cache()
+    with lock:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        stored_at, answer, steps = entry
+        if time.time() - stored_at >= ANSWER_CACHE_TTL:
+            del cache[key]
+            return None
+        cache.move_to_end(key)
+        return answer, steps
+
+def _store_answer(key: tuple, answer: str, steps: list):
+    cache, lock = _answer_cache()
+    with lock:
+        cache[key] = (time.time(), answer, steps)
+        cache.move_to_end(key)
+        while len(cache) > ANSWER_CACHE_SIZE:
+            cache.popitem(last=False)
+
+# GraphCypherQAChain only implements the sync path, so this is the client ChatOpenAI actually uses
+@st.cache_resource(show_spinner=False, on_release=lambda client: client.close())
+def _get_http_client():
+    return httpx.Client(limits=httpx.Limits(max_keepalive_connections=20, max_connections=40))
+
+@st.cache_resource(show_spinner=False)
+def _get_chain(api_key: str, debug: bool = False):
+    return GraphCypherQAChain.from_llm(
+        cypher_llm=ChatOpenAI(api_key=api_key, model=MODEL, temperature=0, timeout=30, http_client=_get_http_client()),
+        # Only the answer LLM streams, so token callbacks carry just the final answer
+        qa_llm=ChatOpenAI(api_key=api_key, model=MODEL, temperature=0, streaming=True, timeout=30, http_client=_get_http_client()),
+        graph=_get_graph(),
+        verbose=os.getenv("LC_VERBOSE") == "1",
+        return_intermediate_steps=debug,
         )
-    return graph, chain
 
-def query_graph(chain: GraphCypherQAChain, query: str):
-    result = chain.invoke({"query": query})["result"]
-    return result 
\ No newline at end of file
+def initialize_resources(api_key: str, debug: bool = False):
+    return _get_graph(), _get_chain(api_key, debug)
+
+class _TokenQueue(BaseCallbackHandler):
+    def __init__(self, tokens: queue.Queue):
+        self.tokens = tokens
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        self.tokens.put(token)
+
+def _stream_result(chain: GraphCypherQAChain, query: str, steps: list | None):
+    # GraphCypherQAChain has no streaming of its own, so run it in a thread and
+    # forward the answer LLM's tokens as they arrive.
+    tokens = queue.Queue()
+    outcome = {}
+
+    def run():
+        try:
+            outcome["output"] = chain.invoke({"query": query}, config={"callbacks": [_TokenQueue(tokens)]})
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            tokens.put(None)
+
+    threading.Thread(target=run, daemon=True).start()
+    streamed = False
+    while (token := tokens.get()) is not None:
+        streamed = True
+        yield token
+    if "error" in outcome:
+        raise outcome["error"]
+    output = outcome["output"]
+    if steps is not None:
+        steps.extend(output.get("intermediate_steps", []))
+    if not streamed:
+        yield output["result"]
+
+def query_graph(chain: GraphCypherQAChain, query: str, steps: list | None = None):
+    key = (query.strip(), _schema_fingerprint(), MODEL)
+    want_steps = chain.return_intermediate_steps
+    cached = _get_cached_answer(key)
+    # A hit without steps cannot serve a chain that is asked to return them
+    if cached is not None and (cached[1] or not want_steps):
+        answer, cached_steps = cached
+        if want_steps and steps is not None:
+            steps.extend(cached_steps)
+        yield answer
+        return
+    answer = ""
+    new_steps = []
+    for chunk in _stream_result(chain, query, new_steps):
+        answer += chunk
+        yield chunk
+    if steps is not None:
+        steps.extend(new_steps)
+    _store_answer(key, answer, new_steps)
+
+def query_graph_many(chain: GraphCypherQAChain, queries: list[str]) -> list[str]:
+    fingerprint = _schema_fingerprint()
+    keys = [(query.strip(), fingerprint, MODEL) for query in queries]
+    answers = [cached[0] if (cached := _get_cached_answer(key)) else None for key in keys]
+    missing = [i for i, answer in enumerate(answers) if answer is None]
+    if missing:
+        results = chain.batch([{"query": queries[i]} for i in missing])
+        for i, result in zip(missing, results):
+            answers[i] = result["result"]
+            _store_answer(keys[i], answers[i], result.get("intermediate_steps", []))
+    return answers
\ No newline at end of file